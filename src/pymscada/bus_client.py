@@ -7,6 +7,13 @@ import logging
 from pymscada.tag import Tag
 import pymscada.protocol_constants as pc
 
+HEAD = struct.Struct('>BBHHQ')  # version, command, tag_id, size, time_us
+FLOAT_VALUE = struct.Struct('!Bd')
+INT_VALUE = struct.Struct('!Bq')
+BYTES_TYPE = bytes((pc.TYPE.BYTES,))
+STR_TYPE = bytes((pc.TYPE.STR,))
+JSON_TYPE = bytes((pc.TYPE.JSON,))
+
 
 class BusClient:
     """
@@ -43,22 +50,19 @@ class BusClient:
             self.to_publish[tag.name] = tag
             return
         if tag.type is float:
-            data = struct.pack('!Bd', pc.TYPE.FLOAT, tag.value)
+            data = FLOAT_VALUE.pack(pc.TYPE.FLOAT, tag.value)
         elif tag.type is int:
-            data = struct.pack('!Bq', pc.TYPE.INT, tag.value)
+            data = INT_VALUE.pack(pc.TYPE.INT, tag.value)
         elif tag.type is bytes:
-            size = len(tag.value)
             try:
-                data = struct.pack(f'!B{size}s', pc.TYPE.BYTES, tag.value)
-            except struct.error as e:
+                data = BYTES_TYPE + tag.value
+            except TypeError as e:
                 logging.error(f'bus_client {tag.name} {e}')
+                return
         elif tag.type is str:
-            size = len(tag.value)
-            data = struct.pack(f'!B{size}s', pc.TYPE.STR, tag.value.encode())
+            data = STR_TYPE + tag.value.encode()
         elif tag.type in [list, dict]:
-            jsonstr = json.dumps(tag.value).encode()
-            size = len(jsonstr)
-            data = struct.pack(f'!B{size}s', pc.TYPE.JSON, jsonstr)
+            data = JSON_TYPE + json.dumps(tag.value).encode()
         else:
             logging.warning(f'publish {tag.name} unhandled {tag.type}')
             return
@@ -73,10 +77,8 @@ class BusClient:
 
     def rta(self, tagname: str, request: dict):
         """Send a Request Set message."""
-        time_us = int(time.time() * 1e6)
-        jsonstr = json.dumps(request).encode()
-        size = len(jsonstr)
-        data = struct.pack(f'>B{size}s', pc.TYPE.JSON, jsonstr)
+        time_us = time.time_ns() // 1000
+        data = JSON_TYPE + json.dumps(request).encode()
         self.write(pc.COMMAND.RTA, self.tag_by_name[tagname].id, time_us, data)
 
     def write(self, command: pc.COMMAND, tag_id: int, time_us: int,
@@ -87,8 +89,7 @@ class BusClient:
         for i in range(0, len(data) + 1, pc.MAX_LEN):
             snip = data[i:i+pc.MAX_LEN]
             size = len(snip)
-            msg = struct.pack(f">BBHHQ{size}s", 1, command, tag_id, size,
-                              time_us, snip)
+            msg = HEAD.pack(1, command, tag_id, size, time_us) + snip
             try:
                 self.writer.write(msg)
             except (asyncio.IncompleteReadError, ConnectionResetError):
@@ -129,7 +130,7 @@ class BusClient:
         while True:
             try:
                 head = await self.reader.readexactly(14)
-                _, cmd, tag_id, size, time_us = struct.unpack('>BBHHQ', head)
+                _, cmd, tag_id, size, time_us = HEAD.unpack(head)
             except (ConnectionResetError, asyncio.IncompleteReadError,
                     asyncio.CancelledError):
                 break
@@ -137,21 +138,21 @@ class BusClient:
                 self.process(cmd, tag_id, time_us, None)
                 continue
             try:
-                payload = await self.reader.readexactly(size)
-                data = struct.unpack(f'>{size}s', payload)[0]
+                data = await self.reader.readexactly(size)
             except (ConnectionResetError, asyncio.IncompleteReadError):
                 break
             # if MAX_LEN then a continuation packet is required
             if size == pc.MAX_LEN:
                 try:
-                    self.pending[tag_id] += data
+                    self.pending[tag_id] += data  # bytearray, extends in place
                 except KeyError:
-                    self.pending[tag_id] = data
+                    self.pending[tag_id] = bytearray(data)
                 continue
             # if not MAX_LEN then this is the final or only packet
             if tag_id in self.pending:
-                data = self.pending[tag_id] + data
-                del self.pending[tag_id]
+                pending = self.pending.pop(tag_id)
+                pending += data
+                data = bytes(pending)
             self.process(cmd, tag_id, time_us, data)
         await self.close_connection()
 
@@ -179,36 +180,30 @@ class BusClient:
                     if self.tag_info is None:
                         return
                     data = self.tag_info[tag.name]['init']
-                    time_us = int(time.time() * 1e6)
+                    time_us = time.time_ns() // 1000
                     bus_id = None  # needed to pub to connected webclients
                     tag.value = data, time_us, bus_id
                     logging.warning(f'{tag.name} init value {data}')
                 except KeyError:
                     pass
                 return
-            data_type = struct.unpack_from('!B', value, offset=0)[0]
+            data_type = value[0]
             if data_type == pc.TYPE.FLOAT:
-                data = struct.unpack_from('!d', value, offset=1)[0]
+                data = FLOAT_VALUE.unpack_from(value)[1]
             elif data_type == pc.TYPE.INT:
-                data = struct.unpack_from('!q', value, offset=1)[0]
+                data = INT_VALUE.unpack_from(value)[1]
             elif data_type == pc.TYPE.BYTES:
-                data = struct.unpack_from(f'!{len(value) - 1}s', value,
-                                          offset=1)[0]
+                data = value[1:]
             elif data_type == pc.TYPE.STR:
-                data = struct.unpack_from(f'!{len(value) - 1}s', value,
-                                          offset=1)[0].decode()
+                data = str(memoryview(value)[1:], 'utf-8')
             elif data_type == pc.TYPE.JSON:
-                data = json.loads(struct.unpack_from(f'!{len(value) - 1}s',
-                                                     value, offset=1
-                                                     )[0].decode())
+                data = json.loads(value[1:])
             else:
                 logging.warning(f'process error {tag.name} {tag.type} {value}')
                 return
             tag.value = data, time_us, id(self)
         elif cmd == pc.COMMAND.RTA:
-            data = struct.unpack_from(f'!{len(value) - 1}s', value, offset=1
-                                      )[0].decode()
-            data = json.loads(data)
+            data = json.loads(value[1:])
             try:
                 self.rta_handlers[tag.name](data)
             except KeyError:
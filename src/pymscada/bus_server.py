@@ -1,11 +1,13 @@
 """Bus protocol pack and unpack."""
 import asyncio
-from struct import pack, unpack
+from struct import Struct
 import time
 import logging
 import socket
 import pymscada.protocol_constants as pc
 
+HEAD = Struct('!BBHHQ')  # version, command, tag_id, size, time_us
+
 
 class BusTags(type):
     """Enforce unique name and ID."""
@@ -39,25 +41,27 @@ class BusTag(metaclass=BusTags):
         self.time_us: int = 0
         self.value: bytes = b''
         self.from_bus: 'BusConnection' = None
-        self.pub = []
+        self.pub: tuple = ()
 
     def add_callback(self, callback, bus_id):
         """Add a callback to update the value when a change is seen."""
         if (callback, bus_id) not in self.pub:
-            self.pub.append((callback, bus_id))
+            self.pub += ((callback, bus_id),)
 
     def del_callback(self, callback, bus_id):
         """Remove the callback."""
         if (callback, bus_id) in self.pub:
-            self.pub.remove((callback, bus_id))
+            self.pub = tuple(p for p in self.pub if p != (callback, bus_id))
 
     def update(self, data: bytes, time_us: int, from_bus: 'BusConnection'):
         """Assign value and update subscribers."""
         self.value = data
         self.time_us = time_us
         self.from_bus = from_bus
+        # tuple is a snapshot, publish may delete a dead subscriber
         for callback, bus_id in self.pub:
-            callback(self, bus_id)
+            if bus_id != from_bus:  # don't echo back to the source
+                callback(self, bus_id)
 
 
 class BusConnection():
@@ -95,8 +99,7 @@ class BusConnection():
         for i in range(0, len(data) + 1, pc.MAX_LEN):
             snip = data[i:i+pc.MAX_LEN]
             size = len(snip)
-            msg = pack(f"!BBHHQ{size}s", 1, command, tag_id, size, time_us,
-                       snip)
+            msg = HEAD.pack(1, command, tag_id, size, time_us) + snip
             try:
                 self.writer.write(msg)
             except (asyncio.IncompleteReadError, ConnectionResetError):
@@ -109,7 +112,7 @@ class BusConnection():
             # start with the command packet, _always_ 14 bytes
             try:
                 head = await self.reader.readexactly(14)
-                _, cmd, tag_id, size, time_us = unpack('!BBHHQ', head)
+                _, cmd, tag_id, size, time_us = HEAD.unpack(head)
             except (ConnectionResetError, asyncio.IncompleteReadError,
                     asyncio.CancelledError):
                 break
@@ -118,22 +121,22 @@ class BusConnection():
                 self.read_callback((bus_id, cmd, tag_id, time_us, None))
                 continue
             try:
-                payload = await self.reader.readexactly(size)
-                data = unpack(f'!{size}s', payload)[0]
+                data = await self.reader.readexactly(size)
             except (ConnectionResetError, asyncio.IncompleteReadError,
                     asyncio.CancelledError):
                 break
             # if MAX_LEN then a continuation packet is required
             if size == pc.MAX_LEN:
                 try:
-                    self.pending[tag_id] += data
+                    self.pending[tag_id] += data  # bytearray, extends in place
                 except KeyError:
-                    self.pending[tag_id] = data
+                    self.pending[tag_id] = bytearray(data)
                 continue
             # if not MAX_LEN then this is the final or only packet
             if tag_id in self.pending:
-                data = self.pending[tag_id] + data
-                del self.pending[tag_id]
+                pending = self.pending.pop(tag_id)
+                pending += data
+                data = bytes(pending)
             self.read_callback((bus_id, cmd, tag_id, time_us, data))
         # on broken connection
         self.read_callback((bus_id, None, 0, 0, None))
@@ -172,13 +175,11 @@ class BusServer:
         self.connections: dict[int, BusConnection] = {}
         self.bus_tag = BusTag(bus_tag.encode())
         self.bus_tag.value = b'\x03started'  # \x03 is string type
-        self.bus_tag.time_us = int(time.time() * 1e6)
+        self.bus_tag.time_us = time.time_ns() // 1000
         self.bus_tag.from_bus = 0
 
     def publish(self, tag: BusTag, bus_id):
         """Update subcribers with tag value change."""
-        if tag.from_bus == bus_id:
-            return
         try:
             self.connections[bus_id].write(pc.COMMAND.SET, tag.id, tag.time_us,
                                            tag.value)
@@ -281,7 +282,7 @@ class BusServer:
                 logging.warning(log_msg)
                 client_addr = self.connections[bus_id].addr
                 self.bus_tag.value = f'\x03{client_addr}: {log_msg}'.encode()
-                self.bus_tag.time_us = int(time.time() * 1e6)
+                self.bus_tag.time_us = time.time_ns() // 1000
         else:  # consider disconnecting
             logging.warn(f'invalid message {cmd}')
 
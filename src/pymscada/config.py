@@ -3,7 +3,11 @@ import importlib.resources
 from importlib.abc import Traversable
 import logging
 from pathlib import Path
-from yaml import safe_load_all, YAMLError
+from yaml import load_all, YAMLError
+try:
+    from yaml import CSafeLoader as SafeLoader  # libyaml, much faster
+except ImportError:
+    from yaml import SafeLoader
 from pymscada import demo, pdf
 
 
@@ -54,7 +58,7 @@ class Config(dict):
                 raise SystemExit(f'config {filename} missing')
         with open(fp, 'r') as fh:
             try:
-                for data in safe_load_all(fh):
+                for data in load_all(fh, Loader=SafeLoader):
                     for x in data:
                         self[x] = data[x]
             except YAMLError as e:
@@ -18,6 +18,9 @@ class SnmpClientConnector:
         self.snmp_name = name
         self.ip = ip
         self.community = community
+        # reuse across polls, target creation resolves the address
+        self.auth = snmp.CommunityData(community)
+        self.transport = snmp.UdpTransportTarget((ip, 161))
         self.read_oids = [snmp.ObjectType(snmp.ObjectIdentity(x))
                           for x in poll]
         self.mapping = mapping
@@ -28,10 +31,11 @@ class SnmpClientConnector:
         """Poll data."""
         r = await snmp.getCmd(
             self.snmp_engine,
-            snmp.CommunityData(self.community),
-            snmp.UdpTransportTarget((self.ip, 161)),
+            self.auth,
+            self.transport,
             snmp.ContextData(),
-            *self.read_oids
+            *self.read_oids,
+            lookupMib=False  # mapping uses numeric OIDs, skip MIB lookup
         )
         errorIndication, errorStatus, errorIndex, varBinds = r
         if errorIndication:
@@ -6,6 +6,7 @@ bus_id is python id(), 0 is null pointer in c, 0 is local bus.
 """
 import time
 import array
+from bisect import bisect_left, bisect_right
 import logging
 from typing import TypedDict, Union, Optional, Type, List
 
@@ -145,23 +146,20 @@ class Tag(metaclass=UniqueTag):
         """Store history in an array.array."""
         self.times_us.append(self.time_us)
         self.values.append(self.value)
-        oldest = self.time_us - self.age_us
-        for _i, t in enumerate(self.times_us):
-            if t >= oldest:
-                return
-        del self.times_us[:_i]
-        del self.values[:_i]
+        # times are in order, drop everything older in one slice
+        stale = bisect_left(self.times_us, self.time_us - self.age_us)
+        if stale:
+            del self.times_us[:stale]
+            del self.values[:stale]
 
     def get(self, time_us: int):
         """Return everything newer."""
         if self.times_us is None:
             return self.__value
-        for i in range(len(self.times_us) - 1, -1, -1):
-            # equal is right as queries are for the most recent
-            # matching time.
-            if self.times_us[i] <= time_us:
-                return self.values[i]
-        return self.values[0]
+        # equal is right as queries are for the most recent
+        # matching time.
+        i = bisect_right(self.times_us, time_us)
+        return self.values[i - 1] if i else self.values[0]
 
     @property
     def value(self):
@@ -182,7 +180,7 @@ class Tag(metaclass=UniqueTag):
                 value, time_us = value
                 from_bus = 0
         else:
-            time_us = int(time.time() * 1e6)
+            time_us = time.time_ns() // 1000
             from_bus = 0
         if type(value) is int and self.type is float:
             value = float(value)
@@ -1,8 +1,35 @@
 import asyncio
 from pysnmp.hlapi.asyncio import *
+from pymscada.tools.walk import open_transport
 
+OID_BATCH_SIZE = 5  # many agents cap OIDs per PDU, some as low as 10
 
-async def run():
+
+async def poll(snmp_engine, transport, community, chunks):
+    """Get all the chunks concurrently and print the results."""
+    results = await asyncio.gather(*[getCmd(
+        snmp_engine,
+        CommunityData(community),
+        transport,
+        ContextData(),
+        *chunk,
+        lookupMib=False  # numeric OIDs only, skip MIB resolution of replies
+    ) for chunk in chunks])
+    for r in results:
+        errorIndication, errorStatus, errorIndex, varBinds = r
+        if errorIndication:
+            print(errorIndication)
+        elif errorStatus:
+            print('%s at %s' % (
+                errorStatus.prettyPrint(),
+                errorIndex and varBinds[int(errorIndex) - 1][0] or '?'))
+        else:
+            for varBind in varBinds:
+                oid, value = varBind
+                print(str(oid), type(oid), str(value), type(value))
+
+
+async def run(count: int = 1, rate: float = 1.0):
     base = [
         '1.3.6.1.2.1.2.2.1.2.',  # name
         # '.1.3.6.1.2.1.2.2.1.4.',  # mtu
@@ -25,27 +52,18 @@ async def run():
     ip_address = '172.26.3.254'
     community = 'public'
 
+    # engine and transport are created once and reused by every poll
     snmp_engine = SnmpEngine()
+    transport = UdpTransportTarget((ip_address, 161))
+    await open_transport(snmp_engine, transport, community)
 
-    r = await getCmd(
-        snmp_engine,
-        CommunityData(community),
-        UdpTransportTarget((ip_address, 161)),
-        ContextData(),
-        *oids
-    )
-    errorIndication, errorStatus, errorIndex, varBinds = r
-    if errorIndication:
-        print(errorIndication)
-    elif errorStatus:
-        print('%s at %s' % (
-            errorStatus.prettyPrint(),
-            errorIndex and varBinds[int(errorIndex) - 1][0] or '?'))
-    else:
-        for varBind in varBinds:
-            oid, value = varBind
-            print(str(oid), type(oid), str(value), type(value))
-    # snmp_engine.transportDispatcher.closeDispatcher()
+    chunks = [oids[i:i + OID_BATCH_SIZE]
+              for i in range(0, len(oids), OID_BATCH_SIZE)]
+    for i in range(count):
+        if i:
+            await asyncio.sleep(rate)
+        await poll(snmp_engine, transport, community, chunks)
+    snmp_engine.transportDispatcher.closeDispatcher()
 
 
 if __name__ == '__main__':
@@ -2,19 +2,22 @@
 Walk whole MIB
 ++++++++++++++
 
-Send a series of SNMP GETNEXT requests using the following options:
+Send a series of SNMP GETBULK requests using the following options:
 
-* with SNMPv3, user 'usr-md5-none', MD5 authentication, no privacy
+* with SNMPv2c, community 'public'
 * over IPv4/UDP
-* to an Agent at demo.snmplabs.com:161
-* for all OIDs in IF-MIB
+* to an Agent at 172.26.3.254:161
+* for all OIDs in each of the MIB roots, walked concurrently
 
 Functionally similar to:
 
-| $ snmpwalk -v3 -lauthPriv -u usr-md5-none -A authkey1 -X privkey1 demo.snmplabs.com  IF-MIB::
+| $ snmpbulkwalk -v2c -c public -Cr25 172.26.3.254 MIB-2
 
 """#
-from pysnmp.hlapi import *
+import asyncio
+import socket
+from pysnmp.hlapi.asyncio import *
+from pysnmp.proto.rfc1905 import EndOfMibView
 
 mibs = {
     'MIKROTIK-MIB': '1.3.6.1.4.1.14988',
@@ -31,25 +34,93 @@ mibs = {
     'UPS-MIB': '1.3.6.1.2.1.33',
     'SQUID-MIB': '1.3.6.1.4.1.3495',
 }
+ip_address = '172.26.3.254'
+community = 'public'
+max_repetitions = 25  # varbinds packed into each GETBULK response
+max_walks = 4  # subtrees walked at once, caps requests in flight
+SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+SOCKET_BUFFER = 7 * 1024 * 1024  # Linux caps this at net.core.rmem_max
 
-iterator = nextCmd(
-    SnmpEngine(),
-    UsmUserData('public'),
-    UdpTransportTarget(('172.26.3.254', 161)),
-    ContextData(),
-    # ObjectType(ObjectIdentity('1.3.6.1.2.1.1.1.0')),
-    # ObjectType(ObjectIdentity('1.3.6.1.2.1.1.6.0'))
-    ObjectType(ObjectIdentity(mibs['MIB-2']))
-)
-
-for errorIndication, errorStatus, errorIndex, varBinds in iterator:
-    if errorIndication:
-        print(errorIndication)
-        break
-    elif errorStatus:
-        print('%s at %s' % (errorStatus.prettyPrint(),
-                            errorIndex and varBinds[int(errorIndex) - 1][0] or '?'))
-        break
-    else:
-        for varBind in varBinds:
-            print(' = '.join([x.prettyPrint() for x in varBind]))
+
+def set_socket_buffers(snmp_engine, transport):
+    """Raise UDP socket buffers once the transport has opened."""
+    carrier = snmp_engine.transportDispatcher.getTransport(
+        transport.transportDomain)
+    sock = carrier.transport.get_extra_info('socket')
+    for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+        sock.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER)
+
+
+async def open_transport(snmp_engine, transport, community: str):
+    """Open the socket with one GET, then raise its buffers."""
+    # pysnmp opens the socket on the first request, the buffers must be
+    # raised before concurrent requests have their replies arrive in bursts
+    await getCmd(snmp_engine, CommunityData(community), transport,
+                 ContextData(), ObjectType(ObjectIdentity(SYS_UPTIME)),
+                 lookupMib=False)
+    set_socket_buffers(snmp_engine, transport)
+
+
+async def walk(snmp_engine, transport, community: str, root: str,
+               limit: asyncio.Semaphore):
+    """Walk one MIB subtree with GETBULK, return the varbinds found."""
+    async with limit:
+        return await _walk(snmp_engine, transport, community, root)
+
+
+async def _walk(snmp_engine, transport, community: str, root: str):
+    found = []
+    current = ObjectIdentity(root)
+    prefix = f'{root}.'
+    while True:
+        errorIndication, errorStatus, errorIndex, varBindTable = \
+            await bulkCmd(
+                snmp_engine,
+                CommunityData(community),
+                transport,
+                ContextData(),
+                0, max_repetitions,
+                ObjectType(current),
+                lookupMib=False  # numeric OIDs only, skip MIB resolution
+            )
+        if errorIndication:
+            print(root, errorIndication)
+            break
+        elif errorStatus:
+            print(root, '%s at %s' % (errorStatus.prettyPrint(),
+                                      errorIndex or '?'))
+            break
+        last = None
+        for varBinds in varBindTable:
+            for oid, value in varBinds:
+                if not str(oid).startswith(prefix) or \
+                        isinstance(value, EndOfMibView):
+                    return found
+                found.append((oid, value))
+                last = oid
+        if last is None:
+            break
+        current = ObjectIdentity(last)
+    return found
+
+
+async def walk_all():
+    """Walk all the MIB roots concurrently so the round trips overlap."""
+    snmp_engine = SnmpEngine()
+    transport = UdpTransportTarget((ip_address, 161))
+    limit = asyncio.Semaphore(max_walks)
+    await open_transport(snmp_engine, transport, community)
+    results = await asyncio.gather(*[
+        walk(snmp_engine, transport, community, root, limit)
+        for root in mibs.values()
+    ])
+    for name, varBinds in zip(mibs.keys(), results):
+        print(f'{name} {len(varBinds)} OIDs')
+        for oid, value in varBinds:
+            print(f'{oid.prettyPrint()} = {value.prettyPrint()}')
+    snmp_engine.transportDispatcher.closeDispatcher()
+
+
+if __name__ == '__main__':
+    """Starts with creating an event loop."""
+    asyncio.run(walk_all())
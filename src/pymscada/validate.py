@@ -1,22 +1,32 @@
 """Config file validation."""
-from cerberus import Validator
+from cerberus import Validator, errors
+from cerberus.errors import ErrorList
 import logging
+import os
+import re
+import threading
 from yaml import dump
+try:
+    from yaml import CSafeDumper as SafeDumper  # libyaml, much faster
+except ImportError:
+    from yaml import SafeDumper
 from pymscada import Config
-from socket import inet_aton
+
+IPV4_OCTET = r'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+IPV4_RE = re.compile(rf'(?:{IPV4_OCTET}\.){{3}}{IPV4_OCTET}')
 
 INT_TAG = {
     'desc': {'type': 'string'},
-    'type': {'type': 'string', 'allowed': ['int']},
+    'type': {'type': 'string', 'allowed': ('int',)},
     'min': {'type': 'integer', 'required': False},
     'max': {'type': 'integer', 'required': False},
     'init': {'type': 'integer', 'required': False},
     'units': {'type': 'string', 'maxlength': 5, 'required': False},
-    'format': {'type': 'string', 'allowed': ['date', 'time', 'datetime']}
+    'format': {'type': 'string', 'allowed': ('date', 'time', 'datetime')}
 }
 FLOAT_TAG = {
     'desc': {'type': 'string'},
-    'type': {'type': 'string', 'allowed': ['float']},
+    'type': {'type': 'string', 'allowed': ('float',)},
     'min': {'type': 'float', 'required': False},
     'max': {'type': 'float', 'required': False},
     'init': {'type': 'float', 'required': False},
@@ -25,16 +35,16 @@ FLOAT_TAG = {
 }
 STR_TAG = {
     'desc': {'type': 'string'},
-    'type': {'type': 'string', 'allowed': ['str']},
+    'type': {'type': 'string', 'allowed': ('str',)},
     'init': {'type': 'string', 'required': False},
 }
 LIST_TAG = {
     'desc': {'type': 'string'},
-    'type': {'type': 'string', 'allowed': ['list']},
+    'type': {'type': 'string', 'allowed': ('list',)},
 }
 DICT_TAG = {
     'desc': {'type': 'string'},
-    'type': {'type': 'string', 'allowed': ['dict']},
+    'type': {'type': 'string', 'allowed': ('dict',)},
     'init': {}
 }
 MULTI_TAG = {
@@ -44,9 +54,18 @@ MULTI_TAG = {
 }
 BYTES_TAG = {
     'desc': {'type': 'string'},
-    'type': {'type': 'string', 'allowed': ['bytes']},
+    'type': {'type': 'string', 'allowed': ('bytes',)},
 }
 
+
+def by_type(*schemas: dict, **extra: dict) -> dict:
+    """Map each allowed 'type' value to its schema, for ms_oneof."""
+    types = {t: schema for schema in schemas
+             for t in schema['type']['allowed']}
+    types.update(extra)
+    return types
+
+
 TAG_SCHEMA = {
     'type': 'dict',
     'keysrules': {
@@ -56,43 +75,48 @@ TAG_SCHEMA = {
     },
     'valuesrules': {
         'type': 'dict',
-        'oneof_schema': [
-            INT_TAG, FLOAT_TAG, STR_TAG, LIST_TAG, DICT_TAG, MULTI_TAG,
-            BYTES_TAG
-        ],
+        # pick the schema from type, multi has no type
+        'ms_oneof': by_type(INT_TAG, FLOAT_TAG, STR_TAG, LIST_TAG, DICT_TAG,
+                            BYTES_TAG, multi=MULTI_TAG),
         # tag type discovery, save for later checking
         'ms_tagtype': True
     },
 }
 
+PORT = {'type': 'integer', 'min': 1024, 'max': 65536}
+NULLABLE_PORT = {**PORT, 'nullable': True}
+PATH = {'type': 'string'}
+TCP_UDP = {'type': 'string', 'allowed': ('tcp', 'udp')}
+ANY_LIST = {'type': 'list', 'schema': {}}
+
 BUS_SCHEMA = {
     'type': 'dict',
     'schema': {
         'ip': {'type': 'string', 'ms_ip': 'ipv4 none'},
-        'port': {'type': 'integer', 'min': 1024, 'max': 65536}
+        'port': PORT
     }
 }
 
 BRHR_LIST = {
-    'type': {'type': 'string', 'allowed': ['br', 'hr']},
+    'type': {'type': 'string', 'allowed': ('br', 'hr')},
 }
 H123P_LIST = {
     'type': {
         'type': 'string',
-        'allowed': ['h1', 'h2', 'h3', 'p'],
+        'allowed': ('h1', 'h2', 'h3', 'p'),
     },
     'desc': {'type': 'string'}
 }
 VALUESETFILES_LIST = {
     'type': {
         'type': 'string',
-        'allowed': ['value', 'setpoint', 'files'],
+        'allowed': ('value', 'setpoint', 'files'),
     },
     # tagname must have been found in parsing tags.yaml
     'tagname': {'type': 'string', 'ms_tagname': 'exists'}
 }
 SELECTDICT_LIST = {
-    'type': {'type': 'string', 'allowed': ['selectdict']},
+    'type': {'type': 'string', 'allowed': ('selectdict',)},
     # tagname must have been found in parsing tags.yaml
     'tagname': {'type': 'string', 'ms_tagname': 'exists'},
     'opts': {
@@ -108,12 +132,12 @@ SELECTDICT_LIST = {
     }
 }
 OPNOTE_LIST = {
-    'type': {'type': 'string', 'allowed': ['opnote']},
+    'type': {'type': 'string', 'allowed': ('opnote',)},
     'site': {'type': 'list'},
     'by': {'type': 'list'}
 }
 UPLOT_LIST = {
-    'type': {'type': 'string', 'allowed': ['uplot']},
+    'type': {'type': 'string', 'allowed': ('uplot',)},
     'ms': {
         'type': 'dict',
         'required': False
@@ -157,10 +181,10 @@ LIST_WWWSERVER = {
             'type': 'list',
             'schema': {
                 'type': 'dict',
-                'oneof_schema': [
+                'ms_oneof': by_type(
                     BRHR_LIST, H123P_LIST, VALUESETFILES_LIST,
                     SELECTDICT_LIST, OPNOTE_LIST, UPLOT_LIST
-                ]
+                )
             }
         },
     }
@@ -170,12 +194,12 @@ WWWSERVER_SCHEMA = {
     'type': 'dict',
     'schema': {
         'bus_ip': {'type': 'string', 'ms_ip': 'none ipv4'},
-        'bus_port': {'type': 'integer', 'min': 1024, 'max': 65536},
+        'bus_port': PORT,
         'ip': {'type': 'string', 'ms_ip': 'none ipv4'},
-        'port': {'type': 'integer', 'min': 1024, 'max': 65536},
+        'port': PORT,
         'get_path': {'nullable': True},
         'serve_path': {'nullable': True},
-        'paths': {'type': 'list', 'allowed': ['history', 'config', 'pdf']},
+        'paths': {'type': 'list', 'allowed': ('history', 'config', 'pdf')},
         'pages': {
             'type': 'list',
             'schema': LIST_WWWSERVER
@@ -187,186 +211,114 @@ HISTORY_SCHEMA = {
     'type': 'dict',
     'schema': {
         'bus_ip': {'type': 'string', 'ms_ip': 'none ipv4'},
-        'bus_port': {'type': 'integer', 'min': 1024, 'max': 65536},
-        'path': {'type': 'string'},
+        'bus_port': PORT,
+        'path': PATH,
     }
 }
 
-MODBUSSERVER_SCHEMA = {
-    'type': 'dict',
-    'schema': {
-        'bus_ip': {'type': 'string', 'ms_ip': 'none ipv4', 'nullable': True},
-        'bus_port': {'type': 'integer', 'min': 1024, 'max': 65536,
-                     'nullable': True},
-        'path': {'type': 'string'},
-        'rtus': {
-            'type': 'list',
-            'schema': {
-                'type': 'dict',
-                'schema': {
-                    'name': {},
-                    'ip': {},
-                    'port': {},
-                    'tcp_udp': {'type': 'string', 'allowed': ['tcp', 'udp']},
-                    'serve': {
-                        'type': 'list',
-                        'schema': {}
-                    }
-                }
-            }
-        },
-        'tags': {
-            'type': 'dict',
-            'keysrules': {
-                'type': 'string',
-                'ms_tagname': 'none'
-            },
-            'valuesrules': {
-                'type': 'dict',
-                'schema': {
-                    'type': {},
-                    'addr': {}
-                },
-            },
-        },
-    }
+IO_BUS = {
+    'bus_ip': {'type': 'string', 'ms_ip': 'ipv4'},
+    'bus_port': NULLABLE_PORT,
+    'path': PATH,
 }
 
-MODBUSCLIENT_SCHEMA = {
-    'type': 'dict',
-    'schema': {
-        'bus_ip': {'type': 'string', 'ms_ip': 'ipv4'},
-        'bus_port': {'type': 'integer', 'min': 1024, 'max': 65536,
-                     'nullable': True},
-        'path': {'type': 'string'},
-        'rtus': {
-            'type': 'list',
-            'schema': {
-                'type': 'dict',
-                'schema': {
-                    'name': {},
-                    'ip': {},
-                    'port': {},
-                    'tcp_udp': {'type': 'string', 'allowed': ['tcp', 'udp']},
-                    'rate': {},
-                    'poll': {
-                        'type': 'list',
-                        'schema': {}
-                    }
-                }
-            }
-        },
-        'tags': {
-            'type': 'dict',
-            'keysrules': {
-                'type': 'string',
-                'ms_tagname': 'exists'
-            },
-            'valuesrules': {
-                'type': 'dict',
-                'schema': {
-                    'type': {},
-                    'read': {},
-                    'write': {}
-                }
-            }
-        }
-    }
-}
 
-SNMPCLIENT_SCHEMA = {
-    'type': 'dict',
-    'schema': {
-        'bus_ip': {'type': 'string', 'ms_ip': 'ipv4'},
-        'bus_port': {'type': 'integer', 'min': 1024, 'max': 65536,
-                     'nullable': True},
-        'path': {'type': 'string'},
-        'rtus': {
-            'type': 'list',
-            'schema': {
-                'type': 'dict',
+def io_schema(rtu: dict, tag: dict, bus: dict = IO_BUS,
+              tagname: str = 'exists') -> dict:
+    """Build an IO driver schema from the parts that differ."""
+    return {
+        'type': 'dict',
+        'schema': {
+            **bus,
+            'rtus': {
+                'type': 'list',
                 'schema': {
-                    'name': {},
-                    'ip': {},
-                    'community': {},
-                    'rate': {},
-                    'poll': {
-                        'type': 'list',
-                        'schema': {}
-                    }
+                    'type': 'dict',
+                    'schema': rtu
                 }
-            }
-        },
-        'tags': {
-            'type': 'dict',
-            'keysrules': {
-                'type': 'string',
-                'ms_tagname': 'exists'
             },
-            'valuesrules': {
+            'tags': {
                 'type': 'dict',
-                'schema': {
-                    'type': {},
-                    'read': {}
+                'keysrules': {
+                    'type': 'string',
+                    'ms_tagname': tagname
+                },
+                'valuesrules': {
+                    'type': 'dict',
+                    'schema': tag
                 }
             }
         }
     }
-}
 
-LOGIXCLIENT_SCHEMA = {
-    'type': 'dict',
-    'schema': {
-        'bus_ip': {'type': 'string', 'ms_ip': 'ipv4'},
-        'bus_port': {'type': 'integer', 'min': 1024, 'max': 65536,
-                     'nullable': True},
-        'path': {'type': 'string'},
-        'rtus': {
-            'type': 'list',
-            'schema': {
-                'type': 'dict',
-                'schema': {
-                    'name': {},
-                    'ip': {},
-                    'rate': {},
-                    'poll': {
-                        'type': 'list',
-                        'schema': {}
-                    }
-                }
-            }
-        },
-        'tags': {
-            'type': 'dict',
-            'keysrules': {
-                'type': 'string',
-                'ms_tagname': 'exists'
-            },
-            'valuesrules': {
-                'type': 'dict',
-                'schema': {
-                    'type': {},
-                    'read': {},
-                    'write': {}
-                }
-            }
-        }
-    }
+
+MODBUSSERVER_SCHEMA = io_schema(
+    bus={
+        'bus_ip': {'type': 'string', 'ms_ip': 'none ipv4', 'nullable': True},
+        'bus_port': NULLABLE_PORT,
+        'path': PATH,
+    },
+    rtu={'name': {}, 'ip': {}, 'port': {}, 'tcp_udp': TCP_UDP,
+         'serve': ANY_LIST},
+    tag={'type': {}, 'addr': {}},
+    tagname='none'
+)
+
+MODBUSCLIENT_SCHEMA = io_schema(
+    rtu={'name': {}, 'ip': {}, 'port': {}, 'tcp_udp': TCP_UDP, 'rate': {},
+         'poll': ANY_LIST},
+    tag={'type': {}, 'read': {}, 'write': {}}
+)
+
+SNMPCLIENT_SCHEMA = io_schema(
+    rtu={'name': {}, 'ip': {}, 'community': {}, 'rate': {},
+         'poll': ANY_LIST},
+    tag={'type': {}, 'read': {}}
+)
+
+LOGIXCLIENT_SCHEMA = io_schema(
+    rtu={'name': {}, 'ip': {}, 'rate': {}, 'poll': ANY_LIST},
+    tag={'type': {}, 'read': {}, 'write': {}}
+)
+
+SCHEMA = {
+    'tags': TAG_SCHEMA,
+    'bus': BUS_SCHEMA,
+    'wwwserver': WWWSERVER_SCHEMA,
+    'history': HISTORY_SCHEMA,
+    'modbusserver': MODBUSSERVER_SCHEMA,
+    'modbusclient': MODBUSCLIENT_SCHEMA,
+    'snmpclient': SNMPCLIENT_SCHEMA,
+    'logixclient': LOGIXCLIENT_SCHEMA,
 }
 
 
+# group error, the child validator's errors nest under the field
+MS_ONEOF = errors.ErrorDefinition(0x8F, 'ms_oneof')
+
+
 class MsValidator(Validator):
     """Additional application checks."""
 
-    ms_tagnames = {}
-    ms_notagcheck = {}
-
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.context = {
+        # Cerberus copies _config into child validators, share state that way
+        self.ms_tagnames = self._config.setdefault('ms_tagnames', set())
+        self.ms_tagtypes = self._config.setdefault('ms_tagtypes', {})
+        self.ms_notagcheck = self._config.setdefault('ms_notagcheck', {})
+        self.context = self._config.setdefault('context', {
             'current_file': None,
             'current_section': None
-        }
+        })
+
+    def ms_reset(self):
+        """Clear state left by a previous validation, keep the schema."""
+        self.ms_tagnames.clear()
+        self.ms_tagtypes.clear()
+        self.ms_notagcheck.clear()
+        self.context['current_file'] = None
+        self.context['current_section'] = None
+        self._errors = ErrorList()
 
     def _validate_ms_tagname(self, constraint, field, value):
         """
@@ -381,7 +333,7 @@ class MsValidator(Validator):
             if field in self.ms_tagnames:
                 self._error(field, f"attempt to redefine in {self.context['current_file']}")
             else:
-                self.ms_tagnames[field] = {'type': None}
+                self.ms_tagnames.add(field)
         elif constraint == 'exists':
             if value not in self.ms_tagnames:
                 self._error(field, f"tag '{value}' was not defined in tags.yaml")
@@ -398,19 +350,40 @@ class MsValidator(Validator):
         {'type': 'boolean'}
         """
         if constraint and field in self.ms_tagnames:
-            if self.ms_tagnames[field]['type'] is None:
+            if field not in self.ms_tagtypes:
                 if 'multi' in value:
-                    self.ms_tagnames[field]['type'] = 'int'
+                    self.ms_tagtypes[field] = 'int'
                 else:
-                    self.ms_tagnames[field]['type'] = value['type']
+                    self.ms_tagtypes[field] = value['type']
             else:
                 self._error(field, 'attempt to redefine type')
         else:
             pass
 
+    def _validate_ms_oneof(self, constraint, field, value):
+        """
+        Validate against the one schema selected by the value's type.
+
+        The rule's arguments are validated against this schema:
+        {'type': 'dict'}
+        """
+        if not isinstance(value, dict):
+            return  # the 'type': 'dict' rule reports this
+        key = value.get('type', 'multi' if 'multi' in value else None)
+        schema = constraint.get(key) if isinstance(key, str) else None
+        if schema is None:
+            self._error(field, f"type '{key}' must be one of "
+                        f"{', '.join(constraint)}")
+            return
+        validator = self._get_child_validator(
+            document_crumb=field, schema_crumb=(field, 'ms_oneof', key),
+            schema=schema, allow_unknown=self.allow_unknown)
+        if not validator(value, update=self.update, normalize=False):
+            self._error(field, MS_ONEOF, validator._errors)
+
     def _validate_ms_ip(self, constraint, field, value):
         """
-        Test session.inet_aton works for the address.
+        Test the address is a dotted quad IPv4 address.
 
         The rule's arguments are validated against this schema:
         {'type': 'string'}
@@ -418,34 +391,49 @@ class MsValidator(Validator):
         if value is None and 'none' in constraint:
             pass
         elif 'ipv4' in constraint:
-            try:
-                inet_aton(value)
-            except (OSError, TypeError):
-                self._error(field, 'ip address fails socket.inet_aton')
+            if not (isinstance(value, str) and IPV4_RE.fullmatch(value)):
+                self._error(field, 'ip address is not dotted quad ipv4')
+
+
+_LOCAL = threading.local()
+_CONFIG_CACHE: dict[str, tuple[tuple[int, int], Config]] = {}
+
+
+def load_config(filename: str) -> Config:
+    """Return Config for filename, only parse again if the file changed."""
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return Config(filename)  # demo file fallback, or SystemExit
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _CONFIG_CACHE.get(filename)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    config = Config(filename)
+    _CONFIG_CACHE[filename] = (stamp, config)
+    return config
 
 
 def validate(path: str = None):
     """Validate."""
-    s = {
-        'tags': TAG_SCHEMA,
-        'bus': BUS_SCHEMA,
-        'wwwserver': WWWSERVER_SCHEMA,
-        'history': HISTORY_SCHEMA,
-        'modbusserver': MODBUSSERVER_SCHEMA,
-        'modbusclient': MODBUSCLIENT_SCHEMA,
-        'snmpclient': SNMPCLIENT_SCHEMA,
-        'logixclient': LOGIXCLIENT_SCHEMA,
-    }
-    v = MsValidator(s)
+    v: MsValidator | None = getattr(_LOCAL, 'validator', None)
+    if v is None:
+        # Cerberus compiles the schema on construction, once per thread
+        v = _LOCAL.validator = MsValidator(SCHEMA)
+    v.ms_reset()
     c = {}
     prefix = './' if path is None else f"{path}/"
-    for name in s.keys():
+    for name in SCHEMA.keys():
         try:
             v.context['current_file'] = f'{name}.yaml'
             v.context['current_section'] = name
-            c[name] = dict(Config(f'{prefix}{name}.yaml'))
+            # Config is a dict, no copy
+            c[name] = load_config(f'{prefix}{name}.yaml')
         except Exception as e:
             v._error(name, f'Failed to load {name}.yaml: {str(e)}')
-            return False, dump(v.errors), prefix
-    res = v.validate(c)
-    return res, dump(v.errors), prefix
\ No newline at end of file
+            return False, dump(v.errors, Dumper=SafeDumper), prefix
+    # schemas have no default/coerce/rename rules, skip normalization
+    res = v.validate(c, normalize=False)
+    if res:
+        return res, '', prefix  # nothing to report, skip the yaml dump
+    return res, dump(v.errors, Dumper=SafeDumper), prefix
\ No newline at end of file
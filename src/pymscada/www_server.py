@@ -1,16 +1,34 @@
 """WWW Server."""
 import asyncio
+from collections import deque
+from itertools import count
 from aiohttp import web, WSMsgType
+from json import dumps
 import logging
 from pathlib import Path
-from struct import pack, unpack_from
+from struct import Struct
 import socket
+from stat import S_ISDIR
 import time
 from pymscada.bus_client import BusClient
 import pymscada.protocol_constants as pc
 from pymscada.tag import Tag, tag_for_web, TYPES
 from pymscada_html import get_html_file
 
+# Network big-endian, tag id Uint16, type Uint16, time_us Uint64
+INT_FRAME = Struct('!HHQq')  # Int64 value
+FLOAT_FRAME = Struct('!HHQd')  # Float64 value
+HEAD_FRAME = Struct('!HHQ')  # str and bytes value follows as needed
+RTA_ID = Struct('>H')  # leading Uint16 of a bytes value
+
+
+def head_frame(tag_id: int, tag_type: int, time_us: int, value: bytes):
+    """Pack the header and value into one buffer, no temporary bytes."""
+    frame = bytearray(HEAD_FRAME.size + len(value))
+    HEAD_FRAME.pack_into(frame, 0, tag_id, tag_type, time_us)
+    frame[HEAD_FRAME.size:] = value
+    return frame
+
 
 class Interface():
     """Provide an interface between web client rta and the action."""
@@ -32,43 +50,53 @@ class WSHandler():
     This are transitory, lasting for a given web browser client.
     """
 
-    ids = set(range(1, 1000))
+    ids = count()  # rta_id is Uint16 on the wire, 0 is for all clients
 
-    def __init__(self, ws: web.WebSocketResponse, pages: dict,
+    def __init__(self, ws: web.WebSocketResponse, pages_json: str,
                  tag_info: dict[str, Tag], do_rta, interface: Interface,
-                 webclient: dict):
+                 webclient_json: str,
+                 tag_info_json: dict[str, tuple[int, str]]):
         """Create callbacks to monitor tag values."""
         self.ws = ws
-        self.pages = pages
+        self.pages_json = pages_json
         self.tag_info = tag_info
-        self.webclient = webclient
+        self.tag_info_json = tag_info_json
+        self.webclient_json = webclient_json
         self.tag_by_id: dict[int, Tag] = {}
         self.tag_by_name: dict[str, Tag] = {}
-        self.queue = asyncio.Queue()
+        self.queue = deque()
+        self.queued = asyncio.Event()
         self.do_rta = do_rta
-        self.rta_id = self.ids.pop()
+        self.rta_id = next(self.ids) % 0xFFFF + 1
         logging.info(f'websocket id {self.rta_id}')
         self.interface = interface
 
-    def __del__(self):
-        """Depends on garbage collector. Is OK."""
-        self.ids.add(self.rta_id)
-
     async def send_queue(self):
         """Run forever, write from queue."""
         try:
             while True:
-                as_bytes, message = await self.queue.get()
-                if as_bytes:
-                    # logging.debug(f'{self.rta_id} as bytes {message}')
-                    await self.ws.send_bytes(message)
-                else:
-                    # logging.debug(f'{self.rta_id} as json {message}')
-                    await self.ws.send_json(message)
+                await self.queued.wait()
+                self.queued.clear()
+                # drain the burst of tag updates, single consumer
+                while self.queue:
+                    as_bytes, message = self.queue.popleft()
+                    if as_bytes:
+                        # logging.debug(f'{self.rta_id} as bytes {message}')
+                        await self.ws.send_bytes(message)
+                    elif isinstance(message, str):  # already JSON
+                        await self.ws.send_str(message)
+                    else:
+                        # logging.debug(f'{self.rta_id} as json {message}')
+                        await self.ws.send_json(message)
         except asyncio.CancelledError:
             logging.warning(f'{self.rta_id}: send queue error, close '
                             f'{self.ws.exception()}')
 
+    def put(self, item: tuple[bool, bytes | bytearray | str | dict]):
+        """Queue a message for send_queue."""
+        self.queue.append(item)
+        self.queued.set()
+
     def publish(self, tag: Tag):
         """
         Prepare message for web client.
@@ -82,85 +110,85 @@ class WSHandler():
         Use q, Q and d for time, int and float.
         i.e. Uint64, Int64, Float64.
         """
-        if tag.type == int:
-            self.queue.put_nowait((True, pack(
-                '!HHQq',            # Network big-endian
-                tag.id,             # Uint16
-                pc.TYPE.INT,        # Uint16
-                tag.time_us,        # Uint64
-                tag.value           # Int64
-            )))
-        elif tag.type == float:
-            self.queue.put_nowait((True, pack(
-                '!HHQd',            # Network big-endian
-                tag.id,             # Uint16
-                pc.TYPE.FLOAT,      # Uint16
-                tag.time_us,        # Uint64
-                tag.value           # Float64
-            )))
-        elif tag.type == str:
-            asbytes = tag.value.encode()
-            self.queue.put_nowait((True, pack(
-                f'!HHQ{len(asbytes)}s',  # Network big-endian
-                tag.id,             # Uint16
-                pc.TYPE.STR,        # Uint16
-                tag.time_us,        # Uint64
-                asbytes             # Char as needed
-            )))
-        elif tag.type is bytes:
-            rta_id = unpack_from('>H', tag.value)[0]
-            if rta_id in [0, self.rta_id]:
-                self.queue.put_nowait((True, pack(
-                    f'!HHQ{len(tag.value)}s',  # Network big-endian
-                    tag.id,             # Uint16
-                    pc.TYPE.BYTES,      # Uint16
-                    tag.time_us,        # Uint64
-                    tag.value           # Char as needed
-                )))
-            else:
-                logging.info(f'{self.rta_id}: {tag.name} bytes mismatch id')
-        elif tag.type is list:
-            self.queue.put_nowait((False, {
-                'type': 'tag',
-                'payload': {
-                    'tagid': tag.id,
-                    'time_us': tag.time_us,
-                    'value': tag.value
-                }
-            }))
-        elif tag.type is dict:
-            if '__rta_id__' in tag.value:
-                if tag.value['__rta_id__'] != self.rta_id:
-                    return
-            self.queue.put_nowait((False, {
-                'type': 'tag',
-                'payload': {
-                    'tagid': tag.id,
-                    'time_us': tag.time_us,
-                    'value': tag.value
-                }
-            }))
+        self.publishers[tag.type](self, tag)
+
+    def publish_int(self, tag: Tag):
+        """Int64 value frame."""
+        self.put((True, INT_FRAME.pack(
+            tag.id, pc.TYPE.INT, tag.time_us, tag.value)))
+
+    def publish_float(self, tag: Tag):
+        """Float64 value frame."""
+        self.put((True, FLOAT_FRAME.pack(
+            tag.id, pc.TYPE.FLOAT, tag.time_us, tag.value)))
+
+    def publish_str(self, tag: Tag):
+        """UTF-8 value frame."""
+        self.put((True, head_frame(
+            tag.id, pc.TYPE.STR, tag.time_us, tag.value.encode())))
+
+    def publish_bytes(self, tag: Tag):
+        """Bytes value frame, only for this or all web clients."""
+        rta_id = RTA_ID.unpack_from(tag.value)[0]
+        if rta_id in [0, self.rta_id]:
+            self.put((True, head_frame(
+                tag.id, pc.TYPE.BYTES, tag.time_us, tag.value)))
+        elif logging.root.isEnabledFor(logging.INFO):
+            # every other web client sees this, don't format when not logged
+            logging.info(f'{self.rta_id}: {tag.name} bytes mismatch id')
+
+    def publish_list(self, tag: Tag):
+        """JSON value message."""
+        self.put((False, {
+            'type': 'tag',
+            'payload': {
+                'tagid': tag.id,
+                'time_us': tag.time_us,
+                'value': tag.value
+            }
+        }))
+
+    def publish_dict(self, tag: Tag):
+        """JSON value message, only for this or all web clients."""
+        if '__rta_id__' in tag.value:
+            if tag.value['__rta_id__'] != self.rta_id:
+                return
+        self.publish_list(tag)
+
+    publishers = {
+        int: publish_int,
+        float: publish_float,
+        str: publish_str,
+        bytes: publish_bytes,
+        list: publish_list,
+        dict: publish_dict
+    }
 
     def notify_id(self, tag: Tag):
         """Must be done here."""
         logging.info(f'{self.rta_id}: send id to webclient for {tag.name}')
         self.tag_info[tag.name]['id'] = tag.id
+        # tag_info is static once the id is known, serialise once for all
+        cached = self.tag_info_json.get(tag.name)
+        if cached is None or cached[0] != tag.id:
+            cached = (tag.id, dumps({'type': 'tag_info',
+                                     'payload': self.tag_info[tag.name]}))
+            self.tag_info_json[tag.name] = cached
         self.tag_by_id[tag.id] = tag
         self.tag_by_name[tag.name] = tag
-        self.queue.put_nowait(
-            (False, {'type': 'tag_info', 'payload': self.tag_info[tag.name]}))
+        self.put((False, cached[1]))
         tag.add_callback(self.publish)
         tag.del_callback_id(self.notify_id)
 
     def do_sub(self, tagname: str):
         """Subscribe to tag value."""
-        try:
-            tag = self.tag_by_name[tagname]
-        except KeyError:
-            if tagname not in self.tag_info:
+        tag = self.tag_by_name.get(tagname)
+        if tag is None:
+            info = self.tag_info.get(tagname)
+            if info is None:
                 logging.warning(f'{self.rta_id}: no {tagname} in tag_info')
                 return
-            tag = Tag(tagname, TYPES[self.tag_info[tagname]['type']])
+            tag = Tag(tagname, TYPES[info['type']])
         if tag.id is None:
             tag.add_callback_id(self.notify_id)
         else:
@@ -171,21 +199,19 @@ class WSHandler():
     async def connection_active(self):
         """Run while the connection is active and don't return."""
         send_queue = asyncio.create_task(self.send_queue())
-        self.queue.put_nowait(
-            (False, {'type': 'webclient', 'payload': self.webclient}))
-        self.queue.put_nowait(
-            (False, {'type': 'pages', 'payload': self.pages}))
+        self.put((False, self.webclient_json))
+        self.put((False, self.pages_json))
         async for msg in self.ws:
             if msg.type == WSMsgType.TEXT:
-                logging.info(f'{self.rta_id}: websocket recv {msg.json()}')
                 command = msg.json()
+                if logging.root.isEnabledFor(logging.INFO):
+                    logging.info(f'{self.rta_id}: websocket recv {command}')
                 action = command['type']
                 tagname = command['tagname']
                 value = command['value']
-                time_us = int(time.time() * 1e6)
-                bus = None
                 if action == 'set':  # pc.CMD_SET
-                    self.tag_by_name[tagname].value = value, time_us, bus
+                    time_us = time.time_ns() // 1000
+                    self.tag_by_name[tagname].value = value, time_us, None
                 elif action == 'rta':  # pc.CMD_RTA
                     if 'File' in value:
                         file = await anext(self.ws)
@@ -202,7 +228,8 @@ class WSHandler():
                     logging.warning(f'{self.rta_id}: CMD_UNSUB not '
                                     'implemented.')
             elif msg.type == WSMsgType.BINARY:
-                logging.info(f'{msg.data}')
+                logging.info(f'{self.rta_id}: websocket binary '
+                             f'{len(msg.data)} bytes')
             elif msg.type == WSMsgType.ERROR:
                 logging.warning(f'{self.rta_id}: ws closing error '
                                 f'{self.ws.exception()}')
@@ -260,31 +287,43 @@ class WwwServer:
                                    module='WWW Server')
         self.ip = ip
         self.port = port
-        self.get_path = get_path
+        self.get_path = Path(get_path) if get_path else None
         self.serve_path = Path(serve_path) if serve_path else None
         for tagname, tag in tag_info.items():
             tag_for_web(tagname, tag)
         self.tag_info = tag_info
+        self.tag_info_json: dict[str, tuple[int, str]] = {}
         self.pages = pages
         self.webclient = webclient
+        # the same for every web client, serialise once
+        self.pages_json = dumps({'type': 'pages', 'payload': pages})
+        self.webclient_json = dumps({'type': 'webclient',
+                                     'payload': webclient})
         self.interface = Interface(www_tag)
+        self.files: dict[str, Path] = {}
 
-    async def redirect_handler(self, _request: web.Request):
-        """Point an empty request to the index."""
+    def get_file(self, name: str) -> Path:
+        """Return the path for a webclient file, resolved once per name."""
+        try:
+            return self.files[name]
+        except KeyError:
+            pass
         if self.get_path is None:
-            file = get_html_file('index.html')
+            file = get_html_file(name)
         else:
-            file = Path(self.get_path, 'index.html')
-        return web.FileResponse(file)
+            file = self.get_path / name
+        if Path(file).is_file():  # don't let bad requests grow the cache
+            self.files[name] = file
+        return file
+
+    async def redirect_handler(self, _request: web.Request):
+        """Point an empty request to the index."""
+        return web.FileResponse(self.get_file('index.html'))
 
     async def web_handler(self, request: web.Request):
         """Point an empty request to the index."""
         logging.info(f"read {request.match_info['file']}")
-        if self.get_path is None:
-            file = get_html_file(request.match_info['file'])
-        else:
-            file = Path(self.get_path, request.match_info['file'])
-        return web.FileResponse(file)
+        return web.FileResponse(self.get_file(request.match_info['file']))
 
     async def path_handler(self, request: web.Request):
         """Plain files."""
@@ -292,10 +331,12 @@ class WwwServer:
         if self.serve_path is None:
             return web.HTTPForbidden(reason='path not configured')
         path = self.serve_path.joinpath(request.match_info['path'])
-        if path.is_dir():
-            return web.HTTPForbidden(reason='folder not permitted')
-        if not path.exists():
+        try:
+            mode = path.stat().st_mode  # one stat for both checks
+        except OSError:
             return web.HTTPNotFound(reason='no such file in path')
+        if S_ISDIR(mode):
+            return web.HTTPForbidden(reason='folder not permitted')
         return web.FileResponse(path)
 
     async def websocket_handler(self, request: web.Request):
@@ -304,8 +345,10 @@ class WwwServer:
         logging.info(f"WS from {peer}")
         ws = web.WebSocketResponse(max_msg_size=0)  # disables max message size
         await ws.prepare(request)
-        await WSHandler(ws, self.pages, self.tag_info, self.busclient.rta,
-                        self.interface, self.webclient).connection_active()
+        await WSHandler(ws, self.pages_json, self.tag_info,
+                        self.busclient.rta, self.interface,
+                        self.webclient_json,
+                        self.tag_info_json).connection_active()
         await ws.close()
         logging.info(f"WS closed {peer}")
         return ws
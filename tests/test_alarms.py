@@ -1,9 +1,10 @@
 """Test Alarms."""
-from pathlib import Path
 import pytest
 from pymscada.alarms import Alarms, ALM, RTN, ACT, INF
 from pymscada.tag import Tag
 
+BUSID = 999
+
 
 @pytest.fixture(scope='module')
 def alarms_db():
@@ -16,10 +17,8 @@ def alarms_db():
             'type': float
         }
     }
-    Path('tests/test_assets/alarms.sqlite').unlink(missing_ok=True)
-    return Alarms(bus_ip=None, bus_port=None,
-                 db='tests/test_assets/alarms.sqlite',
-                 tag_info=tag_info)
+    return Alarms(bus_ip=None, bus_port=None, db=':memory:',
+                  tag_info=tag_info)
 
 
 @pytest.fixture(scope='module')
@@ -34,6 +33,19 @@ def reply_tag():
     return Tag('__wwwserver__', dict)
 
 
+@pytest.fixture
+def alarms_values(alarms_tag):
+    """Collect RTA tag values for one test, then remove the callback."""
+    a_values = []
+
+    def a_cb(tag):
+        a_values.append(tag.value)
+
+    alarms_tag.add_callback(a_cb, BUSID)
+    yield a_values
+    alarms_tag.del_callback(a_cb)
+
+
 def test_db_and_tag(alarms_db, alarms_tag):
     """Basic tests."""
     db = alarms_db
@@ -57,17 +69,10 @@ def test_db_and_tag(alarms_db, alarms_tag):
     assert tag.value['description'] == 'Test alarm condition'
 
 
-def test_history_queries(alarms_db, alarms_tag, reply_tag):
+def test_history_queries(alarms_db, alarms_values, reply_tag):
     """Test history queries."""
-    BUSID = 999
     db = alarms_db
-    a_tag: Tag = alarms_tag
-    a_values = []
-
-    def a_cb(tag):
-        a_values.append(tag.value)
-
-    a_tag.add_callback(a_cb, BUSID)
+    a_values = alarms_values
     
     # Add some test records
     record = {
@@ -98,17 +103,10 @@ def test_history_queries(alarms_db, alarms_tag, reply_tag):
     assert a_values[-1]['description'] == 'Alarm logging stopped'
 
 
-def test_alarm_tag(alarms_db, alarms_tag):
+def test_alarm_tag(alarms_db, alarms_values):
     """Test alarm tag callback."""
-    BUSID = 999
     db = alarms_db
-    a_tag = alarms_tag
-    a_values = []
-
-    def a_cb(tag):
-        a_values.append(tag.value)
-
-    a_tag.add_callback(a_cb, BUSID)
+    a_values = alarms_values
 
     ping_tag = db.tags['localhost_ping']
     ping_tag.value = (3.0, 12345000, BUSID)
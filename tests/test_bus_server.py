@@ -95,7 +95,6 @@ async def test_protocol_message(bus_server):
     """Connect to the server and test the protocol."""
     global server_port
     t_id = None
-    data = b''
     reader, writer = await asyncio.open_connection('127.0.0.1', server_port)
     for test in PROTOCOL_TESTS:
         s_cmd, s_tag_id, s_time_us, s_value = test['send']
@@ -106,31 +105,25 @@ async def test_protocol_message(bus_server):
                    s_value)
         writer.write(msg)
         for reply in test['recv']:
-            # Accumulate responses, can be zero or more
+            # Read one response at a time, can be zero or more
             try:
                 async with asyncio.timeout(0.1):
-                    data += await reader.read(1000)
+                    head = await reader.readexactly(14)
             except TimeoutError:
-                pass
+                head = None
             # confirm there no data when no reply is wanted
             if reply is None:
-                if data == b'':
-                    assert True
-                    continue
-                assert False, test['desc']
+                assert head is None, test['desc']
+                continue
             # A reply is wanted and not received
-            elif reply is not None and data == b'':
-                assert False, test['desc']
+            assert head is not None, test['desc']
             r_cmd, r_tag_id, r_time_us, r_value = reply
-            _v, cmd, tag_id, size, time_us = unpack_from(
-                '!BBHHQ', data, offset=0)
-            data = data[14:]
+            _v, cmd, tag_id, size, time_us = unpack_from('!BBHHQ', head)
             if cmd == COMMAND.ID:
                 t_id = tag_id
             if r_tag_id == 'ID':
                 r_tag_id = t_id
-            value = unpack_from(f'!{size}s', data, offset=0)[0]
-            data = data[size:]
+            value = await reader.readexactly(size)
             assert r_cmd == cmd, test['desc']
             assert r_tag_id is None or r_tag_id == tag_id, test['desc']
             assert r_time_us is None or r_time_us == time_us, test['desc']
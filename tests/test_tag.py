@@ -221,11 +221,21 @@ def test_history():
     """Internal tag history."""
     h1 = Tag('h1', float)
     h1.age_us = 1000
-    h1.value = 0
-    for v in range(1, 100):
-        h1.value = v
-        if v == 50:
-            get_us = h1.time_us
-    a_value = h1.get(get_us)
-    assert a_value in [50, 51]  # Sometimes time is too fast
+    for v in range(100):
+        h1.value = v, 1000000 + v * 10
+    assert h1.get(1000500) == 50
+    assert h1.get(1000505) == 50
     assert len(h1.values) == 100
+
+
+def test_history_age():
+    """History older than age_us is dropped."""
+    h2 = Tag('h2', int)
+    h2.age_us = 1000
+    for v in range(100):
+        h2.value = v, 1000000 + v * 100
+    assert list(h2.times_us) == [1000000 + v * 100 for v in range(89, 100)]
+    assert list(h2.values) == list(range(89, 100))
+    assert h2.get(1009050) == 90
+    assert h2.get(1009900) == 99
+    assert h2.get(0) == 89
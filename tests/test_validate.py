@@ -2,6 +2,7 @@
 import logging
 import pytest
 from pymscada import validate
+from pymscada.validate import MsValidator, SCHEMA
 
 
 @pytest.mark.skip(reason="Validation test needs work")
@@ -12,3 +13,34 @@ def test_validate():
     if not v:
         logging.warning(f"Validation errors: {e}")
     assert v
+
+
+def test_tag_errors():
+    """Tags that fail their type's schema are reported, not raised."""
+    bad_tags = {
+        'min': {'desc': 'x', 'type': 'int', 'min': 1.5},
+        'init': {'desc': 'x', 'multi': ['a', 'b'], 'init': 'a'},
+        'bogus': {'desc': 'x', 'type': 'int', 'bogus': 1},
+        'complex': {'desc': 'x', 'type': 'complex'},
+    }
+    for problem, tag in bad_tags.items():
+        v = MsValidator(SCHEMA)
+        assert not v.validate({'tags': {'bad': tag}}, normalize=False)
+        assert problem in str(v.errors['tags'][0]['bad'])
+
+
+def test_page_item_tagname():
+    """Page items must use a tag from tags.yaml."""
+    tags = {'t1': {'desc': 'x', 'type': 'int'}}
+    good = {'type': 'value', 'tagname': 't1'}
+    bad = {'type': 'value', 'tagname': 'nope'}
+    for items, result in [([good], True), ([good, bad], False)]:
+        v = MsValidator(SCHEMA)
+        config = {
+            'tags': tags,
+            'wwwserver': {
+                'pages': [{'name': 'p', 'parent': None, 'items': items}]
+            }
+        }
+        assert v.validate(config, normalize=False) is result
+    assert "'nope'" in str(v.errors['wwwserver'])